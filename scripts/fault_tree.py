@@ -15,7 +15,112 @@
 
 """Fault tree classes and common facilities."""
 
+import sys
+from array import array
+from io import StringIO
 from collections import deque
+from itertools import count
+from xml.sax.saxutils import escape
+
+#: Generation ids distinguishing separate get_ancestors traversals.
+_ANCESTOR_GENERATION = count(1)
+
+#: Global mutation count validating cached gate XML.
+#: Bumped on every structural change, so cache checks are O(1)
+#: and mutations never walk the tree to invalidate ancestors.
+_MUTATION_GENERATION = [0]
+
+_BE_TMPL = ("<define-basic-event name=\"%s\">\n"
+            "<float value=\"%s\"/>\n"
+            "</define-basic-event>\n")
+_HE_TMPL = ("<define-house-event name=\"%s\">\n"
+            "<constant value=\"%s\"/>\n"
+            "</define-house-event>\n")
+_GATE_OPEN_TMPL = "<define-gate name=\"%s\">\n"
+_FORMULA_OPEN_TMPL = "<%s>\n"
+_ATLEAST_OPEN_TMPL = "<%s min=\"%s\">\n"
+_FORMULA_CLOSE_TMPL = "</%s>\n"
+_ARG_TMPL = "<%s name=\"%s\"/>\n"
+
+# Interned operators enabling identity comparison in hot paths.
+_NULL = sys.intern("null")
+_ATLEAST = sys.intern("atleast")
+
+
+def _xml_attr(value):
+    """Returns the value escaped for use in an XML attribute.
+
+    Clean values, which are the overwhelmingly common case,
+    are returned as-is without paying for the escape call.
+
+    Args:
+        value: A string destined for an XML attribute.
+
+    Returns:
+        The value safe to emit between double quotes.
+    """
+    if any(char in value for char in "&<>\""):
+        return escape(value, {"\"": "&quot;"})
+    return value
+
+
+def _args_to_xml(type_str, container, gate, out):
+    """Appends XML string representation of gate arguments into out."""
+    if not container:
+        return
+    if not gate.complement_arguments:
+        out.append("".join(_ARG_TMPL % (type_str, arg._xml_name)
+                           for arg in container))
+        return
+    for arg in container:
+        complement = arg in gate.complement_arguments
+        if complement:
+            out.append("<not>\n")
+        out.append(_ARG_TMPL % (type_str, arg._xml_name))
+        if complement:
+            out.append("</not>\n")
+
+
+def _convert_formula(root, nest, out):
+    """Appends the XML representation of the formula of a gate into out.
+
+    The formulas of argument gates are converted iteratively
+    with an explicit stack,
+    so deeply nested fault trees do not hit the recursion limit.
+
+    Args:
+        root: The gate whose formula is converted.
+        nest: The level for nesting formulas of argument gates.
+        out: A list of XML fragments to append to.
+    """
+    stack = [(root, nest)]  # gates to convert or literals to emit
+    while stack:
+        entry = stack.pop()
+        if isinstance(entry, str):
+            out.append(entry)
+            continue
+        gate, level = entry
+        if gate._open_tag:
+            out.append(gate._open_tag)
+        _args_to_xml("house-event", gate.h_arguments, gate, out)
+        _args_to_xml("basic-event", gate.b_arguments, gate, out)
+        _args_to_xml("event", gate.u_arguments, gate, out)
+
+        tail = []  # the emission continuation after the current gate
+        if level > 0:
+            for arg in gate.g_arguments:
+                if arg in gate.complement_arguments:
+                    tail.append("<not>\n")
+                    tail.append((arg, level - 1))
+                    tail.append("</not>\n")
+                else:
+                    tail.append((arg, level - 1))
+        else:
+            _args_to_xml("gate", gate.g_arguments, gate, tail)
+
+        if gate._close_tag:
+            tail.append(gate._close_tag)
+        stack.extend(reversed(tail))
 
 
 class Event(object):
@@ -26,6 +131,8 @@ class Event(object):
         parents: A set of parents of this node.
     """
 
+    __slots__ = ("name", "parents", "_ancestor_mark", "_xml_name")
+
     def __init__(self, name):
         """Constructs a new node with a unique name.
 
@@ -34,8 +141,10 @@ class Event(object):
         Args:
             name: Identifier for the node.
         """
-        self.name = name
+        self.name = name  # assumed stable after construction
+        self._xml_name = _xml_attr(name)  # escaped once for emission
         self.parents = set()
+        self._ancestor_mark = 0  # the last get_ancestors generation
 
     def is_common(self):
         """Indicates if this node appears in several places."""
@@ -66,6 +175,8 @@ class BasicEvent(Event):
         prob: Probability of failure of this basic event.
     """
 
+    __slots__ = ("_prob", "_xml_cache")
+
     def __init__(self, name, prob):
         """Initializes a basic event node.
 
@@ -76,15 +187,30 @@ class BasicEvent(Event):
         super(BasicEvent, self).__init__(name)
         self.prob = prob
 
+    @property
+    def prob(self):
+        """Probability of failure of this basic event."""
+        return self._prob
+
+    @prob.setter
+    def prob(self, value):
+        """Sets the probability and drops the cached XML."""
+        self._prob = value
+        self._xml_cache = None
+
     def to_xml(self):
         """Produces the Open-PSA MEF XML definition of the basic event."""
-        return ("<define-basic-event name=\"" + self.name + "\">\n"
-                "<float value=\"" + str(self.prob) + "\"/>\n"
-                "</define-basic-event>\n")
+        if self._xml_cache is None:
+            self._xml_cache = _BE_TMPL % (self._xml_name, self.prob)
+        return self._xml_cache
+
+    def to_xml_stream(self, sink):
+        """Writes the Open-PSA MEF XML definition into the sink."""
+        sink.write(self.to_xml())
 
     def to_aralia(self):
         """Produces the Aralia definition of the basic event."""
-        return "p(" + self.name + ") = " + str(self.prob) + "\n"
+        return f"p({self.name}) = {self.prob}\n"
 
 
 class HouseEvent(Event):
@@ -94,6 +220,8 @@ class HouseEvent(Event):
         state: State of the house event ("true" or "false").
     """
 
+    __slots__ = ("_state", "_xml_cache")
+
     def __init__(self, name, state):
         """Initializes a house event node.
 
@@ -104,15 +232,31 @@ class HouseEvent(Event):
         super(HouseEvent, self).__init__(name)
         self.state = state
 
+    @property
+    def state(self):
+        """State of the house event ("true" or "false")."""
+        return self._state
+
+    @state.setter
+    def state(self, value):
+        """Sets the state and drops the cached XML."""
+        self._state = value
+        self._xml_cache = None
+
     def to_xml(self):
         """Produces the Open-PSA MEF XML definition of the house event."""
-        return ("<define-house-event name=\"" + self.name + "\">\n"
-                "<constant value=\"" + self.state + "\"/>\n"
-                "</define-house-event>\n")
+        if self._xml_cache is None:
+            self._xml_cache = _HE_TMPL % (self._xml_name,
+                                          _xml_attr(self.state))
+        return self._xml_cache
+
+    def to_xml_stream(self, sink):
+        """Writes the Open-PSA MEF XML definition into the sink."""
+        sink.write(self.to_xml())
 
     def to_aralia(self):
         """Produces the Aralia definition of the house event."""
-        return "s(" + self.name + ") = " + str(self.state) + "\n"
+        return f"s({self.name}) = {self.state}\n"
 
 
 class Gate(Event):  # pylint: disable=too-many-instance-attributes
@@ -125,9 +269,13 @@ class Gate(Event):  # pylint: disable=too-many-instance-attributes
         b_arguments: arguments that are basic events.
         h_arguments: arguments that are house events.
         u_arguments: arguments that are undefined.
-        mark: Marking for various algorithms like toposort.
     """
 
+    __slots__ = ("operator", "_k_num", "g_arguments", "b_arguments",
+                 "h_arguments", "u_arguments", "complement_arguments",
+                 "_buckets", "_open_tag", "_close_tag", "_xml_cache",
+                 "_n_args")
+
     def __init__(self, name, operator, k_num=None):
         """Initializes a gate.
 
@@ -137,19 +285,44 @@ class Gate(Event):  # pylint: disable=too-many-instance-attributes
             k_num: Min number for the combination operator.
         """
         super(Gate, self).__init__(name)
-        self.mark = None
-        self.operator = operator
+        # Interned and fixed for the lifetime of the gate.
+        self.operator = sys.intern(operator)
         self.k_num = k_num
-        self.g_arguments = set()
-        self.b_arguments = set()
-        self.h_arguments = set()
-        self.u_arguments = set()
+        self.g_arguments = []
+        self.b_arguments = []
+        self.h_arguments = []
+        self.u_arguments = []
         self.complement_arguments = set()
+        self._n_args = 0  # incrementally maintained argument count
+        # Dispatch table routing arguments to containers by exact type.
+        self._buckets = {Gate: self.g_arguments,
+                         BasicEvent: self.b_arguments,
+                         HouseEvent: self.h_arguments}
+
+    @property
+    def k_num(self):
+        """Min number for the combination operator."""
+        return self._k_num
+
+    @k_num.setter
+    def k_num(self, value):
+        """Sets the min number and refreshes the cached formula tags."""
+        self._k_num = value
+        self._xml_cache = None
+        _MUTATION_GENERATION[0] += 1
+        if self.operator is _NULL:
+            self._open_tag = ""
+            self._close_tag = ""
+        else:
+            if self.operator is _ATLEAST:
+                self._open_tag = _ATLEAST_OPEN_TMPL % (self.operator, value)
+            else:
+                self._open_tag = _FORMULA_OPEN_TMPL % self.operator
+            self._close_tag = _FORMULA_CLOSE_TMPL % self.operator
 
     def num_arguments(self):
         """Returns the number of arguments."""
-        return (len(self.b_arguments) + len(self.h_arguments) +
-                len(self.g_arguments) + len(self.u_arguments))
+        return self._n_args
 
     def add_argument(self, argument, complement=False):
         """Adds argument into a collection of gate arguments.
@@ -167,79 +340,69 @@ class Gate(Event):  # pylint: disable=too-many-instance-attributes
         """
         if complement:
             self.complement_arguments.add(argument)
+        if self in argument.parents:
+            if complement:
+                _MUTATION_GENERATION[0] += 1
+            return  # repeated argument
         argument.parents.add(self)
-        if isinstance(argument, Gate):
-            self.g_arguments.add(argument)
-        elif isinstance(argument, BasicEvent):
-            self.b_arguments.add(argument)
-        elif isinstance(argument, HouseEvent):
-            self.h_arguments.add(argument)
-        else:
+        bucket = self._buckets.get(type(argument))
+        if bucket is None:
             assert isinstance(argument, Event)
-            self.u_arguments.add(argument)
+            bucket = self.u_arguments
+        bucket.append(argument)
+        self._n_args += 1
+        _MUTATION_GENERATION[0] += 1
 
     def get_ancestors(self):
         """Collects ancestors from this gate.
 
+        The visited nodes carry a per-traversal generation mark,
+        so the walk avoids a set-membership test per traversed edge.
+
         Returns:
             A set of ancestors.
         """
+        generation = next(_ANCESTOR_GENERATION)
+        self._ancestor_mark = generation
         ancestors = set([self])
-        parents = deque(self.parents)  # to avoid recursion
-        while parents:
-            parent = parents.popleft()
-            if parent not in ancestors:
+        stack = list(self.parents)  # to avoid recursion
+        while stack:
+            parent = stack.pop()
+            if parent._ancestor_mark != generation:
+                parent._ancestor_mark = generation
                 ancestors.add(parent)
-                parents.extend(parent.parents)
+                stack.extend(parent.parents)
         return ancestors
 
     def to_xml(self, nest=0):
         """Produces the Open-PSA MEF XML definition of the gate.
 
+        The produced XML is cached until any gate is mutated,
+        so repeated exports of an unchanged tree are cheap.
+
         Args:
             nest: The level for nesting formulas of argument gates.
         """
-        def args_to_xml(type_str, container, gate, converter=None):
-            """Produces XML string representation of arguments."""
-            mef_xml = ""
-            for arg in container:
-                complement = arg in gate.complement_arguments
-                if complement:
-                    mef_xml += "<not>\n"
-                if converter:
-                    mef_xml += converter(arg)
-                else:
-                    mef_xml += "<%s name=\"%s\"/>\n" % (type_str, arg.name)
-                if complement:
-                    mef_xml += "</not>\n"
-            return mef_xml
-
-        def convert_formula(gate, nest):
-            """Converts the formula of a gate into XML representation."""
-            mef_xml = ""
-            if gate.operator != "null":
-                mef_xml += "<" + gate.operator
-                if gate.operator == "atleast":
-                    mef_xml += " min=\"" + str(gate.k_num) + "\""
-                mef_xml += ">\n"
-            mef_xml += args_to_xml("house-event", gate.h_arguments, gate)
-            mef_xml += args_to_xml("basic-event", gate.b_arguments, gate)
-            mef_xml += args_to_xml("event", gate.u_arguments, gate)
-
-            if nest > 0:
-                mef_xml += args_to_xml("gate", gate.g_arguments, gate,
-                                       lambda x: convert_formula(x, nest - 1))
-            else:
-                mef_xml += args_to_xml("gate", gate.g_arguments, gate)
-
-            if gate.operator != "null":
-                mef_xml += "</" + gate.operator + ">\n"
-            return mef_xml
+        cache = self._xml_cache
+        generation = _MUTATION_GENERATION[0]
+        if (cache is not None and cache[0] == generation and
+                cache[1] == nest):
+            return cache[2]
+        mef_xml = [_GATE_OPEN_TMPL % self._xml_name]
+        _convert_formula(self, nest, mef_xml)
+        mef_xml.append("</define-gate>\n")
+        result = "".join(mef_xml)
+        self._xml_cache = (generation, nest, result)
+        return result
+
+    def to_xml_stream(self, sink, nest=0):
+        """Writes the Open-PSA MEF XML definition into the sink.
 
-        mef_xml = "<define-gate name=\"" + self.name + "\">\n"
-        mef_xml += convert_formula(self, nest)
-        mef_xml += "</define-gate>\n"
-        return mef_xml
+        Args:
+            sink: A writable file-like object.
+            nest: The level for nesting formulas of argument gates.
+        """
+        sink.write(self.to_xml(nest))
 
     def to_aralia(self):
         """Produces the Aralia definition of the gate.
@@ -255,8 +418,8 @@ class Gate(Event):  # pylint: disable=too-many-instance-attributes
 
         def get_format(operator):
             """Determins formatting for the gate operator."""
-            if operator == "atleast":
-                return "@(" + str(self.k_num) + ", [", ", ", "])"
+            if operator is _ATLEAST:
+                return f"@({self.k_num}, [", ", ", "])"
             return {"and": ("(", " & ", ")"),
                     "or": ("(", " | ", ")"),
                     "xor": ("(", " ^ ", ")"),
@@ -290,6 +453,8 @@ class CcfGroup(object):  # pylint: disable=too-few-public-methods
         factors: The factors of the CCF model.
     """
 
+    __slots__ = ("name", "members", "prob", "model", "factors")
+
     def __init__(self, name):
         """Constructs a unique CCF group with a unique name.
 
@@ -304,23 +469,25 @@ class CcfGroup(object):  # pylint: disable=too-few-public-methods
 
     def to_xml(self):
         """Produces the Open-PSA MEF XML definition of the CCF group."""
-        mef_xml = ("<define-CCF-group name=\"" + self.name + "\""
-                   " model=\"" + self.model + "\">\n<members>\n")
-        for member in self.members:
-            mef_xml += "<basic-event name=\"" + member.name + "\"/>\n"
-        mef_xml += ("</members>\n<distribution>\n<float value=\"" +
-                    str(self.prob) + "\"/>\n</distribution>\n")
-        mef_xml += "<factors>\n"
         assert self.model == "MGL"
         assert self.factors
-        level = 2
-        for factor in self.factors:
-            mef_xml += ("<factor level=\"" + str(level) + "\">\n"
-                        "<float value=\"" + str(factor) + "\"/>\n</factor>\n")
-            level += 1
-
-        mef_xml += "</factors>\n</define-CCF-group>\n"
-        return mef_xml
+        mef_xml = [f"<define-CCF-group name=\"{_xml_attr(self.name)}\""
+                   f" model=\"{self.model}\">\n<members>\n"]
+        mef_xml.append("".join(_ARG_TMPL % ("basic-event", member._xml_name)
+                               for member in self.members))
+        mef_xml.append(f"</members>\n<distribution>\n"
+                       f"<float value=\"{self.prob}\"/>\n</distribution>\n")
+        mef_xml.append("<factors>\n")
+        mef_xml.append("".join(f"<factor level=\"{level}\">\n"
+                               f"<float value=\"{factor}\"/>\n</factor>\n"
+                               for level, factor in enumerate(self.factors,
+                                                              start=2)))
+        mef_xml.append("</factors>\n</define-CCF-group>\n")
+        return "".join(mef_xml)
+
+    def to_xml_stream(self, sink):
+        """Writes the Open-PSA MEF XML definition into the sink."""
+        sink.write(self.to_xml())
 
 
 class FaultTree(object):  # pylint: disable=too-many-instance-attributes
@@ -355,7 +522,6 @@ class FaultTree(object):  # pylint: disable=too-many-instance-attributes
     def to_xml(self, nest=0):
         """Produces the Open-PSA MEF XML definition of the fault tree.
 
-        The fault tree is produced breadth-first.
         The output XML representation is not formatted for human readability.
         The fault tree must be valid and well-formed.
 
@@ -365,31 +531,47 @@ class FaultTree(object):  # pylint: disable=too-many-instance-attributes
         Returns:
             XML snippet representing the fault tree container.
         """
-        mef_xml = "<opsa-mef>\n"
-        mef_xml += "<define-fault-tree name=\"%s\">\n" % self.name
+        buffer = StringIO()
+        self.to_xml_stream(buffer, nest)
+        return buffer.getvalue()
+
+    def to_xml_stream(self, sink, nest=0):
+        """Streams the Open-PSA MEF XML definition of the fault tree.
+
+        The fault tree is produced breadth-first
+        and written into the sink fragment by fragment,
+        so peak memory is bounded by the largest fragment
+        instead of the whole document.
+
+        Args:
+            sink: A writable file-like object.
+            nest: A nesting factor for the Boolean formulae.
+        """
+        write = sink.write
+        write("<opsa-mef>\n")
+        write(f"<define-fault-tree name=\"{_xml_attr(str(self.name))}\">\n")
 
         sorted_gates = toposort_gates(self.top_gates or [self.top_gate],
                                       self.gates)
         for gate in sorted_gates:
-            mef_xml += gate.to_xml(nest)
+            gate.to_xml_stream(sink, nest)
 
         for ccf_group in self.ccf_groups:
-            mef_xml += ccf_group.to_xml()
-        mef_xml += "</define-fault-tree>\n"
+            ccf_group.to_xml_stream(sink)
+        write("</define-fault-tree>\n")
 
-        mef_xml += "<model-data>\n"
+        write("<model-data>\n")
         if self.ccf_groups:
             for basic_event in self.non_ccf_events:
-                mef_xml += basic_event.to_xml()
+                basic_event.to_xml_stream(sink)
         else:
             for basic_event in self.basic_events:
-                mef_xml += basic_event.to_xml()
+                basic_event.to_xml_stream(sink)
 
         for house_event in self.house_events:
-            mef_xml += house_event.to_xml()
-        mef_xml += "</model-data>\n"
-        mef_xml += "</opsa-mef>\n"
-        return mef_xml
+            house_event.to_xml_stream(sink)
+        write("</model-data>\n")
+        write("</opsa-mef>\n")
 
     def to_aralia(self):
         """Produces the Aralia definition of the fault tree.
@@ -403,24 +585,255 @@ class FaultTree(object):  # pylint: disable=too-many-instance-attributes
         Raises:
             KeyError: Some gate operator is not supported.
         """
-        out_txt = self.name + "\n\n"
+        out_txt = [self.name + "\n\n"]
         sorted_gates = toposort_gates([self.top_gate], self.gates)
         for gate in sorted_gates:
-            out_txt += gate.to_aralia()
-        out_txt += "\n"
+            out_txt.append(gate.to_aralia())
+        out_txt.append("\n")
         for basic_event in self.basic_events:
-            out_txt += basic_event.to_aralia()
-        out_txt += "\n"
+            out_txt.append(basic_event.to_aralia())
+        out_txt.append("\n")
         for house_event in self.house_events:
-            out_txt += house_event.to_aralia()
-        return out_txt
+            out_txt.append(house_event.to_aralia())
+        return "".join(out_txt)
+
+
+#: Gate operators in the order of their integer codes.
+OPERATORS = ("and", "or", "atleast", "xor", "not", "null")
+_OPERATOR_CODES = {operator: code for code, operator in enumerate(OPERATORS)}
+
+
+class FaultTreeArrays(object):
+    """Struct-of-arrays representation of a fault tree.
+
+    The object graph of events is flattened into parallel arrays
+    keyed by contiguous integer node ids,
+    so bulk algorithms sweep flat memory
+    instead of chasing per-node Python objects.
+
+    The ids are assigned to basic events first,
+    then to house events,
+    and then to gates in topological order,
+    i.e., a parent gate always precedes its argument gates.
+    The gate arguments are stored in compressed sparse row form:
+    the arguments of the gate at position i among the gates
+    are arg_ids[arg_offsets[i]:arg_offsets[i + 1]].
+
+    Complement and undefined (foreign) arguments are not supported.
+
+    Attributes:
+        name: The name of the fault tree.
+        names: Names of all nodes by node id.
+        num_basic: The number of basic events.
+        num_house: The number of house events.
+        probs: Probabilities of basic and house events by node id.
+            The state of a house event is stored as probability 1 or 0.
+        operators: Integer codes of gate operators, indexing OPERATORS.
+        k_nums: Min numbers of combination gates (0 for other gates).
+        arg_offsets: Positions of per-gate argument slices in arg_ids.
+        arg_ids: Concatenated argument node ids of all gates.
+        top_ids: Node ids of the top gates.
+    """
+
+    def __init__(self):
+        """Initializes empty arrays to be filled by converters."""
+        self.name = None
+        self.names = []
+        self.num_basic = 0
+        self.num_house = 0
+        self.probs = array("d")
+        self.operators = array("b")
+        self.k_nums = array("i")
+        self.arg_offsets = array("i", [0])
+        self.arg_ids = array("i")
+        self.top_ids = []
+
+    @classmethod
+    def from_fault_tree(cls, fault_tree):
+        """Flattens the object graph of a fault tree into arrays.
+
+        Args:
+            fault_tree: A fully constructed FaultTree instance.
+
+        Returns:
+            A FaultTreeArrays instance representing the fault tree.
+        """
+        arrays = cls()
+        arrays.name = fault_tree.name
+        index = {}  # event to node id
+        for basic_event in fault_tree.basic_events:
+            index[basic_event] = len(arrays.names)
+            arrays.names.append(basic_event.name)
+            arrays.probs.append(basic_event.prob)
+        arrays.num_basic = len(arrays.names)
+        for house_event in fault_tree.house_events:
+            index[house_event] = len(arrays.names)
+            arrays.names.append(house_event.name)
+            arrays.probs.append(1.0 if house_event.state == "true" else 0.0)
+        arrays.num_house = len(arrays.names) - arrays.num_basic
+
+        top_gates = fault_tree.top_gates or [fault_tree.top_gate]
+        sorted_gates = toposort_gates(top_gates, fault_tree.gates)
+        for gate in sorted_gates:
+            index[gate] = len(arrays.names)
+            arrays.names.append(gate.name)
+        for gate in sorted_gates:
+            assert not gate.complement_arguments
+            assert not gate.u_arguments
+            arrays.operators.append(_OPERATOR_CODES[gate.operator])
+            arrays.k_nums.append(gate.k_num or 0)
+            for arg in gate.h_arguments:
+                arrays.arg_ids.append(index[arg])
+            for arg in gate.b_arguments:
+                arrays.arg_ids.append(index[arg])
+            for arg in gate.g_arguments:
+                arrays.arg_ids.append(index[arg])
+            arrays.arg_offsets.append(len(arrays.arg_ids))
+        arrays.top_ids = [index[x] for x in top_gates]
+        return arrays
+
+    def num_gates(self):
+        """Returns the number of gates."""
+        return len(self.operators)
+
+    def gate_arguments(self, node_id):
+        """Returns the argument node ids of a gate.
+
+        Args:
+            node_id: The node id of a gate.
+
+        Returns:
+            The slice of arg_ids with the arguments of the gate.
+        """
+        pos = node_id - self.num_basic - self.num_house
+        return self.arg_ids[self.arg_offsets[pos]:self.arg_offsets[pos + 1]]
+
+    def to_xml(self):
+        """Produces the Open-PSA MEF XML definition of the fault tree.
+
+        The emission is one integer-indexed sweep over the node arrays
+        in topological order, without touching the object graph.
+        CCF groups are not represented in the arrays,
+        so the output corresponds to a fault tree without CCF groups.
+
+        Returns:
+            XML snippet representing the fault tree container.
+        """
+        names = self.names
+        num_basic = self.num_basic
+        num_events = num_basic + self.num_house
+        arg_offsets = self.arg_offsets
+        arg_ids = self.arg_ids
+        tree_name = _xml_attr(str(self.name))
+        mef_xml = ["<opsa-mef>\n",
+                   f"<define-fault-tree name=\"{tree_name}\">\n"]
+        for pos in range(self.num_gates()):
+            mef_xml.append(_GATE_OPEN_TMPL % _xml_attr(names[num_events +
+                                                             pos]))
+            operator = OPERATORS[self.operators[pos]]
+            if operator is not _NULL:
+                if operator is _ATLEAST:
+                    mef_xml.append(_ATLEAST_OPEN_TMPL % (operator,
+                                                         self.k_nums[pos]))
+                else:
+                    mef_xml.append(_FORMULA_OPEN_TMPL % operator)
+            for arg in arg_ids[arg_offsets[pos]:arg_offsets[pos + 1]]:
+                if arg < num_basic:
+                    type_str = "basic-event"
+                elif arg < num_events:
+                    type_str = "house-event"
+                else:
+                    type_str = "gate"
+                mef_xml.append(_ARG_TMPL % (type_str, _xml_attr(names[arg])))
+            if operator is not _NULL:
+                mef_xml.append(_FORMULA_CLOSE_TMPL % operator)
+            mef_xml.append("</define-gate>\n")
+        mef_xml.append("</define-fault-tree>\n")
+        mef_xml.append("<model-data>\n")
+        for node_id in range(num_basic):
+            mef_xml.append(_BE_TMPL % (_xml_attr(names[node_id]),
+                                       self.probs[node_id]))
+        for node_id in range(num_basic, num_events):
+            state = "true" if self.probs[node_id] else "false"
+            mef_xml.append(_HE_TMPL % (_xml_attr(names[node_id]), state))
+        mef_xml.append("</model-data>\n")
+        mef_xml.append("</opsa-mef>\n")
+        return "".join(mef_xml)
+
+    def calculate_probabilities(self):
+        """Propagates event probabilities bottom-up to the gates.
+
+        Since the gates are stored in topological order,
+        one reverse sweep over the gate arrays computes
+        the arguments of every gate before the gate itself.
+        The computation treats all arguments as independent,
+        so the result is approximate for trees with common events.
+
+        Returns:
+            An array of probabilities for all nodes by node id.
+        """
+        probs = array("d", self.probs)
+        probs.extend([0.0] * self.num_gates())
+        num_events = self.num_basic + self.num_house
+        arg_ids = self.arg_ids
+        arg_offsets = self.arg_offsets
+        for pos in range(self.num_gates() - 1, -1, -1):
+            args = arg_ids[arg_offsets[pos]:arg_offsets[pos + 1]]
+            operator = OPERATORS[self.operators[pos]]
+            if operator == "and":
+                prob = 1.0
+                for arg in args:
+                    prob *= probs[arg]
+            elif operator == "or":
+                prob = 1.0
+                for arg in args:
+                    prob *= 1.0 - probs[arg]
+                prob = 1.0 - prob
+            elif operator == "atleast":
+                prob = _prob_atleast([probs[x] for x in args],
+                                     self.k_nums[pos])
+            elif operator == "xor":
+                prob = 0.0  # the probability of an odd number of events
+                for arg in args:
+                    arg_prob = probs[arg]
+                    prob = (prob * (1.0 - arg_prob) +
+                            (1.0 - prob) * arg_prob)
+            elif operator == "not":
+                assert len(args) == 1
+                prob = 1.0 - probs[args[0]]
+            else:
+                assert operator == "null"
+                assert len(args) == 1
+                prob = probs[args[0]]
+            probs[num_events + pos] = prob
+        return probs
+
+
+def _prob_atleast(arg_probs, k_num):
+    """Computes the probability of at least k out of n independent events.
+
+    Args:
+        arg_probs: Probabilities of the independent argument events.
+        k_num: Min number of events for the combination.
+
+    Returns:
+        The probability of k_num or more events occurring.
+    """
+    # total[j] is the probability of exactly j events
+    # among the arguments processed so far.
+    total = [1.0] + [0.0] * len(arg_probs)
+    for num, prob in enumerate(arg_probs):
+        for j in range(num + 1, 0, -1):
+            total[j] = total[j] * (1.0 - prob) + total[j - 1] * prob
+        total[0] *= 1.0 - prob
+    return sum(total[k_num:])
 
 
 def toposort_gates(root_gates, gates):
     """Sorts gates topologically starting from the root gate.
 
-    The gate marks are used for the algorithm.
-    After this sorting the marks are reset to None.
+    The visit state is tracked in local sets,
+    so the gates themselves are not mutated by the sorting.
 
     Args:
         root_gates: The root gates of the graph.
@@ -429,28 +842,46 @@ def toposort_gates(root_gates, gates):
     Returns:
         A deque of sorted gates.
     """
-    for gate in gates:
-        gate.mark = ""
+    temp = set()  # gates in the current depth-first path
+    perm = set()  # gates that are fully processed
 
-    def visit(gate, final_list):
-        """Recursively visits the given gate sub-tree to include into the list.
+    def visit(root, final_list):
+        """Visits the given gate sub-tree to include into the list.
+
+        The depth-first search is iterative with an explicit stack,
+        so deep fault trees do not hit the recursion limit.
 
         Args:
-            gate: The current gate.
+            root: The root gate of the sub-tree.
             final_list: A deque of sorted gates.
         """
-        assert gate.mark != "temp"
-        if not gate.mark:
-            gate.mark = "temp"
-            for arg in gate.g_arguments:
-                visit(arg, final_list)
-            gate.mark = "perm"
-            final_list.appendleft(gate)
+        if root in perm:
+            return
+        # Pre-bound methods to avoid attribute lookups in the hot loop.
+        temp_add = temp.add
+        temp_remove = temp.remove
+        perm_add = perm.add
+        appendleft = final_list.appendleft
+        stack = [(root, iter(root.g_arguments))]
+        stack_append = stack.append
+        stack_pop = stack.pop
+        temp_add(root)
+        while stack:
+            gate, arguments = stack[-1]
+            for arg in arguments:
+                assert arg not in temp  # a cycle in the graph
+                if arg not in perm:
+                    temp_add(arg)
+                    stack_append((arg, iter(arg.g_arguments)))
+                    break
+            else:
+                temp_remove(gate)
+                perm_add(gate)
+                appendleft(gate)
+                stack_pop()
 
     sorted_gates = deque()
     for root_gate in root_gates:
         visit(root_gate, sorted_gates)
     assert len(sorted_gates) == len(gates)
-    for gate in gates:
-        gate.mark = None
     return sorted_gates
@@ -948,7 +948,7 @@ def main(argv=None):
         else:
             write_info(fault_tree, tree_file, args.seed)
             write_summary(fault_tree, tree_file)
-            tree_file.write(fault_tree.to_xml(args.nest))
+            fault_tree.to_xml_stream(tree_file, args.nest)
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,115 @@
+# Copyright (C) 2014-2016 Olzhas Rakhimov
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the common fault tree facilities."""
+
+from unittest import TestCase
+
+from nose.tools import assert_equal, assert_almost_equal, assert_true
+
+from fault_tree import BasicEvent, HouseEvent, Gate, FaultTree, \
+    FaultTreeArrays, OPERATORS
+
+
+class XmlCacheTestCase(TestCase):
+    """Tests for the cached XML serialization of events."""
+
+    def test_gate_cache_invalidation(self):
+        """Tests that mutations drop the cached XML of ancestors."""
+        root = Gate("root", "or")
+        child = Gate("G1", "and")
+        root.add_argument(child)
+        child.add_argument(BasicEvent("B1", 0.1))
+        cached = root.to_xml(1)
+        assert_equal(cached, root.to_xml(1))
+        child.add_argument(BasicEvent("B2", 0.2))
+        fresh = root.to_xml(1)
+        assert_true(cached != fresh)
+        assert_true("B2" in fresh)
+
+
+class FaultTreeArraysTestCase(TestCase):
+    """Tests for the flattening of fault trees into parallel arrays."""
+
+    def setUp(self):
+        """Constructs a simple two-gate fault tree."""
+        self.fault_tree = FaultTree("TestingTree")
+        self.root = Gate("root", "or")
+        self.child = Gate("G1", "and")
+        self.basic_events = [BasicEvent("B1", 0.1), BasicEvent("B2", 0.2)]
+        self.house_event = HouseEvent("H1", "true")
+        self.root.add_argument(self.child)
+        self.root.add_argument(self.basic_events[0])
+        self.child.add_argument(self.basic_events[1])
+        self.child.add_argument(self.house_event)
+        self.fault_tree.top_gate = self.root
+        self.fault_tree.gates = [self.root, self.child]
+        self.fault_tree.basic_events = self.basic_events
+        self.fault_tree.house_events = [self.house_event]
+
+    def test_from_fault_tree(self):
+        """Tests the construction of arrays from the object graph."""
+        arrays = FaultTreeArrays.from_fault_tree(self.fault_tree)
+        assert_equal(["B1", "B2", "H1", "root", "G1"], arrays.names)
+        assert_equal(2, arrays.num_basic)
+        assert_equal(1, arrays.num_house)
+        assert_equal(2, arrays.num_gates())
+        assert_equal([0.1, 0.2, 1.0], list(arrays.probs))
+        assert_equal(["or", "and"],
+                     [OPERATORS[x] for x in arrays.operators])
+        assert_equal([3], arrays.top_ids)
+        assert_equal([0, 4], sorted(arrays.gate_arguments(3)))
+        assert_equal([1, 2], sorted(arrays.gate_arguments(4)))
+
+    def test_to_xml(self):
+        """Tests that the array emission matches the object graph's."""
+        arrays = FaultTreeArrays.from_fault_tree(self.fault_tree)
+        assert_equal(self.fault_tree.to_xml(), arrays.to_xml())
+
+    def test_calculate_probabilities(self):
+        """Tests the bottom-up propagation of probabilities."""
+        arrays = FaultTreeArrays.from_fault_tree(self.fault_tree)
+        probs = arrays.calculate_probabilities()
+        assert_almost_equal(0.2, probs[4])  # and(B2, H1)
+        assert_almost_equal(1 - 0.9 * 0.8, probs[3])  # or(B1, G1)
+
+    def test_calculate_probabilities_atleast(self):
+        """Tests the combination gate probability."""
+        fault_tree = FaultTree("Vote")
+        root = Gate("root", "atleast", 2)
+        for prob in (0.1, 0.2, 0.3):
+            root.add_argument(BasicEvent("B%f" % prob, prob))
+        fault_tree.top_gate = root
+        fault_tree.gates = [root]
+        fault_tree.basic_events = list(root.b_arguments)
+        arrays = FaultTreeArrays.from_fault_tree(fault_tree)
+        probs = arrays.calculate_probabilities()
+        # 2-out-of-3: sum of exactly two plus all three.
+        expected = (0.1 * 0.2 * 0.7 + 0.1 * 0.8 * 0.3 + 0.9 * 0.2 * 0.3 +
+                    0.1 * 0.2 * 0.3)
+        assert_almost_equal(expected, probs[3])
+
+
+def test_unnamed_fault_tree():
+    """Tests serialization of a default-constructed (unnamed) tree."""
+    fault_tree = FaultTree()
+    root = Gate("root", "or")
+    root.add_argument(BasicEvent("B1", 0.1))
+    fault_tree.top_gate = root
+    fault_tree.gates = [root]
+    fault_tree.basic_events = list(root.b_arguments)
+    assert_true("<define-fault-tree name=\"None\">" in fault_tree.to_xml())
+    arrays = FaultTreeArrays.from_fault_tree(fault_tree)
+    assert_true("<define-fault-tree name=\"None\">" in arrays.to_xml())